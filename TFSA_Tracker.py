@@ -1,17 +1,23 @@
 import datetime
+import itertools
 import os
 
 import pandas as pd
-import plotly.graph_objects as go
 import streamlit as st
 from supabase import Client, create_client
 
 st.set_page_config(page_title="TFSA Tracker", layout="wide")
 
 
-SUPABASE_URL = os.environ["SUPABASE_URL"].strip()
-SUPABASE_KEY = os.environ["SUPABASE_KEY"].strip()
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+@st.cache_resource
+def get_supabase_client() -> Client:
+    # Shared across reruns and sessions so the HTTP connection pool is reused.
+    return create_client(
+        os.environ["SUPABASE_URL"].strip(), os.environ["SUPABASE_KEY"].strip()
+    )
+
+
+supabase = get_supabase_client()
 
 # Annual TFSA limits published by CRA.
 # For years not yet listed here, reuse the latest known limit.
@@ -35,116 +41,307 @@ TFSA_LIMITS = {
     2025: 7000,
 }
 BASE_TFSA_YEAR = min(TFSA_LIMITS.keys())
+LATEST_TFSA_YEAR = max(TFSA_LIMITS.keys())
+
+# Transactions shown per page of history.
+HISTORY_PAGE_SIZE = 50
+
+# Running total of room from BASE_TFSA_YEAR through each listed year.
+_CUMULATIVE_LIMITS = dict(
+    zip(
+        sorted(TFSA_LIMITS),
+        itertools.accumulate(TFSA_LIMITS[year] for year in sorted(TFSA_LIMITS)),
+    )
+)
 
 
 def get_tfsa_limit_for_year(year: int) -> int:
     if year in TFSA_LIMITS:
         return TFSA_LIMITS[year]
-    if year > max(TFSA_LIMITS.keys()):
-        latest_known_year = max(TFSA_LIMITS.keys())
-        return TFSA_LIMITS[latest_known_year]
+    if year > LATEST_TFSA_YEAR:
+        return TFSA_LIMITS[LATEST_TFSA_YEAR]
     return 0
 
 
-def load_start_year(email: str) -> int:
-    resp = (
-        supabase.table("user_settings")
-        .select("start_year")
-        .eq("user_email", email)
-        .execute()
+def get_cumulative_limit(year: int) -> int:
+    """Total room accumulated from BASE_TFSA_YEAR through `year`, inclusive."""
+    if year < BASE_TFSA_YEAR:
+        return 0
+    if year > LATEST_TFSA_YEAR:
+        extra_years = year - LATEST_TFSA_YEAR
+        return (
+            _CUMULATIVE_LIMITS[LATEST_TFSA_YEAR]
+            + extra_years * TFSA_LIMITS[LATEST_TFSA_YEAR]
+        )
+    return _CUMULATIVE_LIMITS[year]
+
+
+@st.cache_resource
+def get_data_versions() -> dict[str, int]:
+    # Shared by every session on this server, so a write from one session
+    # invalidates the cached state for all of them.
+    return {}
+
+
+def get_data_version(email: str) -> int:
+    return get_data_versions().get(email, 0)
+
+
+def bump_data_version(email: str) -> None:
+    # Moves every session onto a fresh load_user_state cache key for `email`.
+    versions = get_data_versions()
+    versions[email] = versions.get(email, 0) + 1
+
+
+# Kept in memory only: `version` picks up writes made through this server. The
+# TTL only limits how stale a cache hit can be; once a session holds a state,
+# current_user_state keeps reusing it while the (email, page, version)
+# signature matches, so changes made outside this server show up after
+# "Refresh data". `version` must stay unprefixed so Streamlit includes it in
+# the cache key.
+@st.cache_data(ttl=60, max_entries=256, show_spinner=False)
+def load_user_state(email: str, page: int, version: int) -> dict:
+    # One RPC returns the settings row, yearly totals and a page of contributions.
+    resp = supabase.rpc(
+        "get_user_state",
+        {
+            "p_email": email,
+            "p_offset": page * HISTORY_PAGE_SIZE,
+            "p_limit": HISTORY_PAGE_SIZE,
+        },
+    ).execute()
+    return resp.data or {}
+
+
+def get_page_count(state: dict) -> int:
+    return max(-(-state.get("contribution_count", 0) // HISTORY_PAGE_SIZE), 1)
+
+
+def current_user_state(email: str) -> dict:
+    # Reruns with nothing new (same email, page and version) reuse the state
+    # kept in the session and skip even the cache lookup.
+    signature = (
+        email, st.session_state.get("history_page", 0), get_data_version(email)
     )
-    if resp.data:
-        return resp.data[0]["start_year"]
-    return 2009
+    if st.session_state.get("user_state_signature") != signature:
+        st.session_state.user_state = load_user_state(*signature)
+        st.session_state.user_state_signature = signature
+
+    # Rows may have been deleted elsewhere; fall back to the last page that exists.
+    last_page = get_page_count(st.session_state.user_state) - 1
+    if st.session_state.get("history_page", 0) > last_page:
+        st.session_state.history_page = last_page
+        return current_user_state(email)
+    return st.session_state.user_state
+
+
+def remember_user_state(email: str, state: dict, page: int = 0) -> None:
+    # Write RPCs return the first history page for the new data version.
+    st.session_state.history_page = page
+    st.session_state.user_state = state
+    st.session_state.user_state_signature = (email, page, get_data_version(email))
+
+
+def get_start_year(state: dict) -> int:
+    return state.get("start_year") or BASE_TFSA_YEAR
 
 
 def save_start_year(email: str, year: int) -> None:
     supabase.table("user_settings").upsert(
         {"user_email": email, "start_year": year}
     ).execute()
+    bump_data_version(email)
+    # Only the year changed, so carry this session's payload over to the new
+    # version rather than fetching it again.
+    remember_user_state(
+        email,
+        {**st.session_state.get("user_state", {}), "start_year": year},
+        st.session_state.get("history_page", 0),
+    )
 
 
-def load_data(email: str) -> pd.DataFrame:
-    resp = supabase.table("contributions").select("*").eq("user_email", email).execute()
-    data = resp.data or []
-
-    if not data:
+def rows_to_frame(rows: list[dict]) -> pd.DataFrame:
+    if not rows:
         return pd.DataFrame(columns=["id", "Date", "Institution", "Amount"])
 
-    df = pd.DataFrame(data)
-    df["Date"] = pd.to_datetime(df["date"])
-    df["Institution"] = df["institution"]
-    df["Amount"] = df["amount"]
+    # Arrow-backed columns avoid boxing every string as a Python object.
+    df = pd.DataFrame(rows).convert_dtypes(dtype_backend="pyarrow")
+    # ISO "YYYY-MM-DD" strings display and sort correctly as-is; no parsing needed.
+    df["Date"] = df["date"]
+    df["Institution"] = df["institution"].astype("category")
+    # convert_dtypes turns whole-dollar pages into int64; money stays a double.
+    df["Amount"] = df["amount"].astype("double[pyarrow]")
     return df[["id", "Date", "Institution", "Amount"]]
 
 
-def save_row(email: str, date: datetime.date, institution: str, amount: float) -> None:
+# Writes go through RPCs (see supabase/migrations) that return the same payload
+# as get_user_state (first page of history), so the caller can render it
+# without another round trip.
+def save_row(email: str, date: datetime.date, institution: str, amount: float) -> dict:
     payload = {
-        "user_email": email,
-        "date": date.isoformat(),
-        "institution": institution,
-        "amount": float(amount),
+        "p_email": email,
+        "p_date": date.isoformat(),
+        "p_institution": institution,
+        "p_amount": float(amount),
+        "p_limit": HISTORY_PAGE_SIZE,
     }
-    supabase.table("contributions").insert(payload).execute()
+    resp = supabase.rpc("insert_contribution", payload).execute()
+    bump_data_version(email)
+    return resp.data or {}
 
 
-def delete_row(email: str, row_id: int) -> None:
-    (
-        supabase.table("contributions")
-        .delete()
-        .eq("id", row_id)
-        .eq("user_email", email)
-        .execute()
-    )
+def delete_rows(email: str, row_ids: list[int]) -> dict:
+    resp = supabase.rpc(
+        "delete_contributions",
+        {"p_email": email, "p_ids": row_ids, "p_limit": HISTORY_PAGE_SIZE},
+    ).execute()
+    bump_data_version(email)
+    return resp.data or {}
 
 
-def clear_all_data(email: str) -> None:
-    supabase.table("contributions").delete().eq("user_email", email).execute()
+def clear_all_data(email: str) -> dict:
+    resp = supabase.rpc(
+        "clear_contributions", {"p_email": email, "p_limit": HISTORY_PAGE_SIZE}
+    ).execute()
+    bump_data_version(email)
+    return resp.data or {}
 
 
 def get_total_limit(start_year: int) -> int:
     current_year = datetime.datetime.now().year
-    return sum(get_tfsa_limit_for_year(y) for y in range(start_year, current_year + 1))
+    if start_year > current_year:
+        return 0
+    return get_cumulative_limit(current_year) - get_cumulative_limit(start_year - 1)
+
 
+def get_yearly_totals(state: dict, current_year: int) -> tuple[float, float, float]:
+    """Total deposits, total withdrawals, and withdrawals before `current_year`."""
+    deposits = withdrawals = prior_withdrawals = 0.0
+    for row in state.get("yearly") or []:
+        deposits += row["deposits"]
+        withdrawals += row["withdrawals"]
+        if row["year"] < current_year:
+            prior_withdrawals += row["withdrawals"]
+    return deposits, withdrawals, prior_withdrawals
 
-def build_progress_chart(contributed: float, limit: float) -> go.Figure:
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def build_progress_chart(contributed: float, limit: float) -> dict:
+    # A raw figure spec: skips graph_objects validation when building the chart.
     percent_used = (contributed / limit) * 100 if limit else 0
 
-    fig = go.Figure()
-    fig.add_trace(
-        go.Bar(
-            x=["Contribution Room"],
-            y=[limit],
-            marker_color="#E5E7EB",
-            hoverinfo="skip",
-            name="Total Room",
-            width=[0.45],
-        )
+    total_bar = dict(
+        type="bar",
+        x=["Contribution Room"],
+        y=[limit],
+        marker=dict(color="#E5E7EB"),
+        hoverinfo="skip",
+        name="Total Room",
+        width=[0.45],
     )
-    fig.add_trace(
-        go.Bar(
-            x=["Contribution Room"],
-            y=[contributed],
-            marker_color="#0F766E",
-            text=f"{percent_used:.1f}% used",
-            textposition="inside",
-            hovertemplate="Used: $%{y:,.2f}<extra></extra>",
-            name="Used",
-            width=[0.45],
-        )
+    used_bar = dict(
+        type="bar",
+        x=["Contribution Room"],
+        y=[contributed],
+        marker=dict(color="#0F766E"),
+        text=f"{percent_used:.1f}% used",
+        textposition="inside",
+        hovertemplate="Used: $%{y:,.2f}<extra></extra>",
+        name="Used",
+        width=[0.45],
     )
-
-    fig.update_layout(
+    layout = dict(
         barmode="overlay",
         height=350,
         margin=dict(l=12, r=12, t=12, b=12),
         xaxis=dict(showgrid=False, showticklabels=False),
-        yaxis=dict(title="CAD", showgrid=True, gridcolor="#E5E7EB"),
+        yaxis=dict(title=dict(text="CAD"), showgrid=True, gridcolor="#E5E7EB"),
         paper_bgcolor="rgba(0,0,0,0)",
         plot_bgcolor="rgba(0,0,0,0)",
         legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
     )
-    return fig
+    return dict(data=[total_bar, used_bar], layout=layout)
+
+
+def draw_progress_chart(contributed: float, limit: float) -> None:
+    # Round to cents so float noise doesn't miss the figure cache.
+    fig = build_progress_chart(round(float(contributed), 2), round(float(limit), 2))
+    st.plotly_chart(fig, use_container_width=True)
+
+
+def submit_transaction(email: str) -> None:
+    # Form callback: runs before the rerun the submit triggers, so the new
+    # state is rendered by that same rerun.
+    amount = st.session_state.add_amount
+    if st.session_state.add_type == "Withdrawal":
+        amount = -amount
+    try:
+        state = save_row(
+            email, st.session_state.add_date, st.session_state.add_institution, amount
+        )
+    except Exception as exc:
+        st.session_state.add_result = (False, f"Could not save transaction: {exc}")
+        return
+    remember_user_state(email, state)
+    st.session_state.add_result = (True, "Transaction recorded.")
+
+
+# A fragment, so picking rows to delete reruns only this section.
+@st.fragment
+def render_history(email: str, state: dict, df: pd.DataFrame) -> None:
+    if df.empty:
+        st.info("No transactions yet.")
+    else:
+        st.dataframe(
+            df[["Date", "Institution", "Amount"]],
+            use_container_width=True,
+            hide_index=True,
+        )
+
+    page = st.session_state.get("history_page", 0)
+    page_count = get_page_count(state)
+    prev_col, page_col, next_col = st.columns([1, 2, 1])
+    with prev_col:
+        if st.button("Newer", disabled=page == 0, use_container_width=True):
+            st.session_state.history_page = page - 1
+            st.rerun()
+    with page_col:
+        st.caption(f"Page {page + 1} of {page_count}")
+    with next_col:
+        if st.button(
+            "Older", disabled=page + 1 >= page_count, use_container_width=True
+        ):
+            st.session_state.history_page = page + 1
+            st.rerun()
+
+    if df.empty:
+        return
+
+    labels = (
+        df["Date"]
+        + " • "
+        + df["Institution"].astype(str)
+        + " • $"
+        + df["Amount"].map("{:,.2f}".format)
+    )
+
+    label_by_id = dict(zip(df["id"], labels))
+
+    del_col1, del_col2 = st.columns([3, 1])
+    with del_col1:
+        row_ids = st.multiselect(
+            "Select transactions to delete",
+            list(label_by_id),
+            format_func=label_by_id.__getitem__,
+        )
+    with del_col2:
+        st.markdown("<div style='height: 1.8rem'></div>", unsafe_allow_html=True)
+        if st.button("Delete selected", disabled=not row_ids, use_container_width=True):
+            remember_user_state(
+                email, delete_rows(email, [int(row_id) for row_id in row_ids])
+            )
+            st.success("Transactions deleted.")
+            st.rerun()
 
 
 def apply_app_style() -> None:
@@ -180,18 +377,27 @@ st.markdown(
 user_email = st.text_input(
     "Email", value=st.session_state.user_email, placeholder="name@email.com"
 ).strip().lower()
+if user_email != st.session_state.user_email:
+    st.session_state.history_page = 0
 st.session_state.user_email = user_email
 
 if not user_email:
     st.info("Enter your email to load your profile.")
     st.stop()
 
-init_year = load_start_year(user_email)
+state = current_user_state(user_email)
+
+# The saved year is read once per email and then tracked here, so changing it
+# does not invalidate the cached contributions.
+start_years = st.session_state.setdefault("start_years", {})
+if user_email not in start_years:
+    start_years[user_email] = get_start_year(state)
+init_year = start_years[user_email]
 current_year = datetime.datetime.now().year
 years = list(range(BASE_TFSA_YEAR, current_year + 1))
 default_idx = years.index(init_year) if init_year in years else 0
 
-controls_col1, controls_col2 = st.columns([2, 1])
+controls_col1, controls_col2, controls_col3 = st.columns([2, 1, 1])
 with controls_col1:
     start_year = st.selectbox(
         "TFSA eligibility year",
@@ -200,28 +406,27 @@ with controls_col1:
         help="The first year you were eligible for TFSA contribution room.",
     )
 with controls_col2:
+    # Saving is explicit so browsing years doesn't write on every change.
+    st.markdown("<div style='height: 1.9rem'></div>", unsafe_allow_html=True)
+    if st.button(
+        "Save start year", disabled=start_year == init_year, use_container_width=True
+    ):
+        save_start_year(user_email, start_year)
+        start_years[user_email] = start_year
+        st.rerun()
+with controls_col3:
     st.markdown("<div style='height: 1.9rem'></div>", unsafe_allow_html=True)
     if st.button("Refresh data", use_container_width=True):
+        start_years.pop(user_email, None)
+        bump_data_version(user_email)
         st.rerun()
 
-if start_year != init_year:
-    save_start_year(user_email, start_year)
-
 limit = get_total_limit(start_year)
-df = load_data(user_email)
-df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
-df = df.dropna(subset=["Date"]).copy()
-df["Year"] = df["Date"].dt.year
-df.sort_values("Date", ascending=False, inplace=True)
-
-deposits_by_year = df[df["Amount"] > 0].groupby("Year")["Amount"].sum()
-withdrawals_by_year = df[df["Amount"] < 0].groupby("Year")["Amount"].sum().abs()
-
-room_used = deposits_by_year.sum()
-total_withdrawals = withdrawals_by_year.sum()
-withdrawals_prior_to_current = withdrawals_by_year.loc[
-    withdrawals_by_year.index < current_year
-].sum()
+df = rows_to_frame(state.get("contributions") or [])
+
+room_used, total_withdrawals, withdrawals_prior_to_current = get_yearly_totals(
+    state, current_year
+)
 remaining_room = max(limit + withdrawals_prior_to_current - room_used, 0)
 
 m1, m2, m3, m4 = st.columns(4)
@@ -233,61 +438,40 @@ m4.metric("Remaining", f"${remaining_room:,.0f}")
 chart_col, action_col = st.columns([2, 1])
 with chart_col:
     st.markdown("#### Contribution Overview")
-    st.plotly_chart(build_progress_chart(room_used, limit), use_container_width=True)
+    percent_used = (room_used / limit) * 100 if limit else 0
+    st.progress(min(percent_used / 100, 1.0), text=f"{percent_used:.1f}% used")
+    if st.toggle("Detailed chart"):
+        draw_progress_chart(room_used, limit)
     if room_used > limit:
         st.error("Potential over-contribution detected. Please review your records.")
 
 with action_col:
     st.markdown("#### Add transaction")
     with st.form("add_transaction", clear_on_submit=True):
-        date = st.date_input("Date", datetime.date.today())
-        transaction_type = st.radio("Type", ["Deposit", "Withdrawal"], horizontal=True)
-        institution = st.text_input("Institution", "Wealthsimple")
-        amount = st.number_input("Amount (CAD)", min_value=0.0, step=100.0)
-        submitted = st.form_submit_button("Save", use_container_width=True)
-
-        if submitted:
-            signed_amount = amount if transaction_type == "Deposit" else -amount
-            try:
-                save_row(user_email, date, institution, signed_amount)
-                st.success("Transaction recorded.")
-                st.rerun()
-            except Exception as exc:
-                st.error(f"Could not save transaction: {exc}")
-
-st.markdown("#### Transaction history")
+        st.date_input("Date", datetime.date.today(), key="add_date")
+        st.radio("Type", ["Deposit", "Withdrawal"], horizontal=True, key="add_type")
+        st.text_input("Institution", "Wealthsimple", key="add_institution")
+        st.number_input("Amount (CAD)", min_value=0.0, step=100.0, key="add_amount")
+        st.form_submit_button(
+            "Save",
+            use_container_width=True,
+            on_click=submit_transaction,
+            args=(user_email,),
+        )
 
-if df.empty:
-    st.info("No transactions yet.")
-else:
-    st.dataframe(
-        df[["Date", "Institution", "Amount"]],
-        use_container_width=True,
-        hide_index=True,
-    )
+    result = st.session_state.pop("add_result", None)
+    if result is not None:
+        saved, message = result
+        if saved:
+            st.success(message)
+        else:
+            st.error(message)
 
-    options = df.apply(
-        lambda r: f"{r['Date'].date()} • {r['Institution']} • ${r['Amount']:,.2f}", axis=1
-    ).tolist()
+st.markdown("#### Transaction history")
 
-    del_col1, del_col2 = st.columns([3, 1])
-    with del_col1:
-        delete_label = st.selectbox("Select transaction to delete", options)
-    with del_col2:
-        st.markdown("<div style='height: 1.8rem'></div>", unsafe_allow_html=True)
-        if st.button("Delete selected", use_container_width=True):
-            row = df[
-                df.apply(
-                    lambda r: f"{r['Date'].date()} • {r['Institution']} • ${r['Amount']:,.2f}",
-                    axis=1,
-                )
-                == delete_label
-            ].iloc[0]
-            delete_row(user_email, int(row["id"]))
-            st.success("Transaction deleted.")
-            st.rerun()
+render_history(user_email, state, df)
 
 if st.button("Clear all transactions", type="secondary"):
-    clear_all_data(user_email)
+    remember_user_state(user_email, clear_all_data(user_email))
     st.success("All transactions cleared.")
     st.rerun()
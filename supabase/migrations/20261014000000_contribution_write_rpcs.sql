@@ -0,0 +1,29 @@
+-- Write paths that return the caller's updated contributions in the same
+-- round trip, so the app does not need a follow-up select after each write.
+
+create or replace function public.insert_contribution(
+    p_email text,
+    p_date date,
+    p_institution text,
+    p_amount numeric
+)
+returns setof public.contributions
+language sql
+as $$
+    insert into public.contributions (user_email, date, institution, amount)
+    values (p_email, p_date, p_institution, p_amount);
+
+    select * from public.contributions where user_email = p_email;
+$$;
+
+create or replace function public.delete_contribution(
+    p_email text,
+    p_id bigint
+)
+returns setof public.contributions
+language sql
+as $$
+    delete from public.contributions where id = p_id and user_email = p_email;
+
+    select * from public.contributions where user_email = p_email;
+$$;
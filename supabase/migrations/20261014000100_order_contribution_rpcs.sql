@@ -0,0 +1,28 @@
+-- Return rows newest first so the app can render them without a client-side sort.
+
+create or replace function public.insert_contribution(
+    p_email text,
+    p_date date,
+    p_institution text,
+    p_amount numeric
+)
+returns setof public.contributions
+language sql
+as $$
+    insert into public.contributions (user_email, date, institution, amount)
+    values (p_email, p_date, p_institution, p_amount);
+
+    select * from public.contributions where user_email = p_email order by date desc;
+$$;
+
+create or replace function public.delete_contribution(
+    p_email text,
+    p_id bigint
+)
+returns setof public.contributions
+language sql
+as $$
+    delete from public.contributions where id = p_id and user_email = p_email;
+
+    select * from public.contributions where user_email = p_email order by date desc;
+$$;
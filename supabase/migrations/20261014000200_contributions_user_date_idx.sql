@@ -0,0 +1,4 @@
+-- Lets the per-user "order by date desc" reads stream rows from the index
+-- instead of sorting them.
+create index if not exists contributions_user_date_idx
+    on public.contributions (user_email, date desc);
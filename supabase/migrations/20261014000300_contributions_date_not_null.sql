@@ -0,0 +1,2 @@
+-- The app parses contribution dates strictly and no longer drops null rows.
+alter table public.contributions alter column date set not null;
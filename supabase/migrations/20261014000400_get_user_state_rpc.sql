@@ -0,0 +1,69 @@
+-- Everything the app needs for one user in a single round trip: the saved
+-- eligibility year and the contributions, newest first.
+create or replace function public.get_user_state(p_email text)
+returns jsonb
+language sql
+stable
+as $$
+    select jsonb_build_object(
+        'start_year',
+        (select start_year from public.user_settings where user_email = p_email),
+        'contributions',
+        coalesce(
+            (
+                select jsonb_agg(
+                    jsonb_build_object(
+                        'id', c.id,
+                        'date', c.date,
+                        'institution', c.institution,
+                        'amount', c.amount
+                    )
+                    order by c.date desc
+                )
+                from public.contributions c
+                where c.user_email = p_email
+            ),
+            '[]'::jsonb
+        )
+    );
+$$;
+
+-- Write paths return the same payload as get_user_state.
+drop function if exists public.insert_contribution(text, date, text, numeric);
+drop function if exists public.delete_contribution(text, bigint);
+
+create function public.insert_contribution(
+    p_email text,
+    p_date date,
+    p_institution text,
+    p_amount numeric
+)
+returns jsonb
+language sql
+as $$
+    insert into public.contributions (user_email, date, institution, amount)
+    values (p_email, p_date, p_institution, p_amount);
+
+    select public.get_user_state(p_email);
+$$;
+
+create function public.delete_contribution(
+    p_email text,
+    p_id bigint
+)
+returns jsonb
+language sql
+as $$
+    delete from public.contributions where id = p_id and user_email = p_email;
+
+    select public.get_user_state(p_email);
+$$;
+
+create or replace function public.clear_contributions(p_email text)
+returns jsonb
+language sql
+as $$
+    delete from public.contributions where user_email = p_email;
+
+    select public.get_user_state(p_email);
+$$;
@@ -0,0 +1,57 @@
+-- Per-user yearly deposit and withdrawal totals, aggregated next to the data.
+create or replace view public.contrib_by_year
+with (security_invoker = true)
+as
+select
+    user_email,
+    extract(year from date)::int as year,
+    coalesce(sum(amount) filter (where amount > 0), 0) as deposits,
+    coalesce(sum(-amount) filter (where amount < 0), 0) as withdrawals
+from public.contributions
+group by user_email, extract(year from date)::int;
+
+-- get_user_state (and the write RPCs built on it) now also carry the yearly
+-- totals, so the app no longer aggregates contributions itself.
+create or replace function public.get_user_state(p_email text)
+returns jsonb
+language sql
+stable
+as $$
+    select jsonb_build_object(
+        'start_year',
+        (select start_year from public.user_settings where user_email = p_email),
+        'contributions',
+        coalesce(
+            (
+                select jsonb_agg(
+                    jsonb_build_object(
+                        'id', c.id,
+                        'date', c.date,
+                        'institution', c.institution,
+                        'amount', c.amount
+                    )
+                    order by c.date desc
+                )
+                from public.contributions c
+                where c.user_email = p_email
+            ),
+            '[]'::jsonb
+        ),
+        'yearly',
+        coalesce(
+            (
+                select jsonb_agg(
+                    jsonb_build_object(
+                        'year', y.year,
+                        'deposits', y.deposits,
+                        'withdrawals', y.withdrawals
+                    )
+                    order by y.year
+                )
+                from public.contrib_by_year y
+                where y.user_email = p_email
+            ),
+            '[]'::jsonb
+        )
+    );
+$$;
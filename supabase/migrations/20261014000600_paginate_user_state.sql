@@ -0,0 +1,59 @@
+-- Page the contributions list returned by get_user_state. Totals come from
+-- contrib_by_year, so paging never affects the contribution-room math.
+drop function if exists public.get_user_state(text);
+
+create function public.get_user_state(
+    p_email text,
+    p_offset int default 0,
+    p_limit int default 50
+)
+returns jsonb
+language sql
+stable
+as $$
+    select jsonb_build_object(
+        'start_year',
+        (select start_year from public.user_settings where user_email = p_email),
+        'contributions',
+        coalesce(
+            (
+                select jsonb_agg(
+                    jsonb_build_object(
+                        'id', p.id,
+                        'date', p.date,
+                        'institution', p.institution,
+                        'amount', p.amount
+                    )
+                    order by p.date desc, p.id desc
+                )
+                from (
+                    select c.id, c.date, c.institution, c.amount
+                    from public.contributions c
+                    where c.user_email = p_email
+                    order by c.date desc, c.id desc
+                    offset p_offset
+                    limit p_limit
+                ) p
+            ),
+            '[]'::jsonb
+        ),
+        'contribution_count',
+        (select count(*) from public.contributions where user_email = p_email),
+        'yearly',
+        coalesce(
+            (
+                select jsonb_agg(
+                    jsonb_build_object(
+                        'year', y.year,
+                        'deposits', y.deposits,
+                        'withdrawals', y.withdrawals
+                    )
+                    order by y.year
+                )
+                from public.contrib_by_year y
+                where y.user_email = p_email
+            ),
+            '[]'::jsonb
+        )
+    );
+$$;
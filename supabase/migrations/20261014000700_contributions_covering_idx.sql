@@ -0,0 +1,7 @@
+-- Covering version of contributions_user_date_idx: get_user_state's page query
+-- reads id, institution and amount straight from the index.
+create index if not exists contributions_user_date_covering_idx
+    on public.contributions (user_email, date desc)
+    include (id, institution, amount);
+
+drop index if exists public.contributions_user_date_idx;
@@ -0,0 +1,14 @@
+-- Delete any number of the caller's contributions in one round trip.
+drop function if exists public.delete_contribution(text, bigint);
+
+create function public.delete_contributions(
+    p_email text,
+    p_ids bigint[]
+)
+returns jsonb
+language sql
+as $$
+    delete from public.contributions where id = any(p_ids) and user_email = p_email;
+
+    select public.get_user_state(p_email);
+$$;
@@ -0,0 +1,46 @@
+-- Write RPCs take the page size from the caller instead of relying on
+-- get_user_state's default p_limit.
+drop function if exists public.insert_contribution(text, date, text, numeric);
+drop function if exists public.delete_contributions(text, bigint[]);
+drop function if exists public.clear_contributions(text);
+
+create function public.insert_contribution(
+    p_email text,
+    p_date date,
+    p_institution text,
+    p_amount numeric,
+    p_limit int
+)
+returns jsonb
+language sql
+as $$
+    insert into public.contributions (user_email, date, institution, amount)
+    values (p_email, p_date, p_institution, p_amount);
+
+    select public.get_user_state(p_email, 0, p_limit);
+$$;
+
+create function public.delete_contributions(
+    p_email text,
+    p_ids bigint[],
+    p_limit int
+)
+returns jsonb
+language sql
+as $$
+    delete from public.contributions where id = any(p_ids) and user_email = p_email;
+
+    select public.get_user_state(p_email, 0, p_limit);
+$$;
+
+create function public.clear_contributions(
+    p_email text,
+    p_limit int
+)
+returns jsonb
+language sql
+as $$
+    delete from public.contributions where user_email = p_email;
+
+    select public.get_user_state(p_email, 0, p_limit);
+$$;
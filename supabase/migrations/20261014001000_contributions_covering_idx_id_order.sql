@@ -0,0 +1,7 @@
+-- Put id in the key, not INCLUDE, so the index also supplies the
+-- "date desc, id desc" tiebreak used by get_user_state's page query.
+drop index if exists public.contributions_user_date_covering_idx;
+
+create index if not exists contributions_user_date_id_covering_idx
+    on public.contributions (user_email, date desc, id desc)
+    include (institution, amount);